@@ -1,13 +1,26 @@
 # Import necessary libraries
 import os
+import re
+import string
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-
-from PIL import Image, UnidentifiedImageError
+from functools import lru_cache
 
 # Constants
 SPACE_WIDTH = 30
+DEFAULT_IMAGE_HEIGHT = 1
 MAX_FILENAME_LENGTH = 255
+PNG_COMPRESS_LEVEL = 1
+PRELOAD_MIN_CHARACTERS = 3
+FILENAME_SANITIZE_PATTERN = re.compile(r'[^A-Za-z0-9]+')
 DESKTOP_PATH = os.path.expanduser("~/Desktop")
+
+# Shared pool for decoding glyphs, its threads are only started on first use
+PRELOAD_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# (font_paths, char) keys held by load_character_array's cache, which never evicts
+DECODED_CHARACTERS = set()
+
 SPECIAL_CHARACTERS = {
     '!': 'Exclamation', '?': 'Question', "'": 'Apostrophe', '*': 'Asterisk',
     ')': 'Bracket-Left', '}': 'Bracket-Left-2', ']': 'Bracket-Left-3',
@@ -25,7 +38,7 @@ SPECIAL_CHARACTERS = {
 def generate_filename(user_input):
     try:
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        sanitized_input = '-'.join(filter(str.isalnum, user_input.split()))
+        sanitized_input = FILENAME_SANITIZE_PATTERN.sub('-', user_input).strip('-')
         filename = f"{sanitized_input}-{timestamp}.png"
         return filename if len(filename) <= MAX_FILENAME_LENGTH else f"{timestamp}.png"
     except Exception as e:
@@ -43,59 +56,108 @@ def get_font_paths(font, color):
     except Exception as e:
         raise RuntimeError(f"Error getting font paths: {str(e)}")
 
-# Function to get the image path for a specific character based on its type
-def get_character_image_path(char, font_paths):
+# Function to build the character to image path table for a font, once per font
+@lru_cache(maxsize=None)
+def get_character_table(font_paths):
     CHARACTERS_FOLDER, NUMBERS_FOLDER, SYMBOLS_FOLDER = font_paths
+    table = {}
 
-    if char.isalpha():
-        folder = 'Lower-Case' if char.islower() else 'Upper-Case'
-        char_img_path = os.path.join(CHARACTERS_FOLDER, folder, f"{char}.png")
-    elif char.isdigit():
-        char_img_path = os.path.join(NUMBERS_FOLDER, f"{char}.png")
-    elif char == ' ':
-        return None
-    else:
-        char_img_path = os.path.join(SYMBOLS_FOLDER, f"{SPECIAL_CHARACTERS.get(char, '')}.png")
+    for char in string.ascii_lowercase:
+        table[char] = os.path.join(CHARACTERS_FOLDER, 'Lower-Case', f"{char}.png")
+    for char in string.ascii_uppercase:
+        table[char] = os.path.join(CHARACTERS_FOLDER, 'Upper-Case', f"{char}.png")
+    for char in string.digits:
+        table[char] = os.path.join(NUMBERS_FOLDER, f"{char}.png")
+    for char, name in SPECIAL_CHARACTERS.items():
+        table[char] = os.path.join(SYMBOLS_FOLDER, f"{name}.png")
 
-    if not os.path.isfile(char_img_path):
-        return None
-    return char_img_path
+    return table
+
+# Function to get the image path for a specific character based on its type
+def get_character_image_path(char, font_paths):
+    # A missing file is reported by Image.open when the character is loaded
+    return get_character_table(tuple(font_paths)).get(char)
+
+# Function to load and decode a character image
+def load_character_image(font_paths, char):
+    from PIL import Image
+
+    char_img_path = get_character_image_path(char, font_paths)
+    if not char_img_path:
+        raise FileNotFoundError(f"Image not found for character '{char}'")
+    with Image.open(char_img_path) as char_img:
+        return char_img.convert("RGBA")
+
+# Function to get a character image as an RGBA pixel array, cached per font and character
+# The cache is unbounded: every glyph of every font together is only a few MB
+@lru_cache(maxsize=None)
+def load_character_array(font_paths, char):
+    import numpy as np
+
+    char_arr = np.asarray(load_character_image(font_paths, char), dtype=np.uint8)
+    DECODED_CHARACTERS.add((font_paths, char))
+    return char_arr
+
+# Function to decode the characters of a text in parallel before they are composed
+def preload_character_arrays(text, font_paths):
+    new_chars = {char for char in set(text) - {' '} if (font_paths, char) not in DECODED_CHARACTERS}
+    if len(new_chars) < PRELOAD_MIN_CHARACTERS:
+        return
+
+    # Errors are left in the futures; the serial pass reports them with their character
+    wait([PRELOAD_EXECUTOR.submit(load_character_array, font_paths, char) for char in new_chars])
 
 # Generates an image from the given text using character images from specified fonts.
 def generate_image(text, filename, font_paths):
+    # Pillow and NumPy are imported on first use to keep startup fast
+    import numpy as np
+    from PIL import Image, UnidentifiedImageError
+
     img_height = None
-    char_images = {}
+    glyphs = []
     img_path = os.path.join(DESKTOP_PATH, filename)
+    font_paths = tuple(font_paths)
 
     try:
-        total_width = 0
+        preload_character_arrays(text, font_paths)
 
         # Iterate through each character in the input text
         for char in text:
             if char == ' ':
-                # Create an empty space character image
-                char_img = Image.new("RGBA", (SPACE_WIDTH, img_height or 1), (0, 0, 0, 0))
-            else:
-                # Get the path to the character image based on the font
-                char_img_path = get_character_image_path(char, font_paths)
-                if not char_img_path:
-                    raise FileNotFoundError(f"Image not found for character '{char}'")
-                char_img = Image.open(char_img_path).convert("RGBA")
-
-            char_images[char] = char_img
-            img_height = char_img.height if img_height is None else img_height
-            total_width += char_img.width
-
-        # Create the final image and paste character images into it
-        final_img = Image.new("RGBA", (total_width, img_height), (0, 0, 0, 0))
-        x = 0
-
-        for char in text:
-            final_img.paste(char_images[char], (x, 0))
-            x += char_images[char].width
+                # Spaces only advance the cursor, the canvas is already transparent
+                glyphs.append((None, SPACE_WIDTH))
+                continue
+
+            # Get the decoded character pixels for the font
+            char_arr = load_character_array(font_paths, char)
+            glyphs.append((char_arr, char_arr.shape[1]))
+            img_height = char_arr.shape[0] if img_height is None else img_height
+
+        img_height = img_height or DEFAULT_IMAGE_HEIGHT
+
+        # Compute every glyph's column range up front
+        offsets = np.cumsum([0] + [width for _, width in glyphs]).tolist()
+        placements = [
+            (char_arr, offsets[i], offsets[i + 1])
+            for i, (char_arr, _) in enumerate(glyphs)
+            if char_arr is not None
+        ]
+
+        # Create the final image buffer and copy character pixels into it
+        canvas = np.zeros((img_height, offsets[-1], 4), dtype=np.uint8)
+
+        # Glyphs of one font normally share a height, so check once and copy whole columns
+        if all(char_arr.shape[0] == img_height for char_arr, _, _ in placements):
+            for char_arr, start, end in placements:
+                canvas[:, start:end] = char_arr
+        else:
+            for char_arr, start, end in placements:
+                height = min(char_arr.shape[0], img_height)
+                canvas[:height, start:end] = char_arr[:height]
 
         # Save the final image
-        final_img.save(img_path)
+        final_img = Image.fromarray(canvas, "RGBA")
+        final_img.save(img_path, format="PNG", compress_level=PNG_COMPRESS_LEVEL, optimize=False)
 
         return (filename, None)
 
@@ -1,5 +1,6 @@
 # Import necessary libraries
 import sys
+import threading
 import customtkinter
 import customtkinter as ctk
 from tkinter import messagebox
@@ -30,31 +31,47 @@ def generate_and_display_image():
     font = int(font_var.get())
     color = color_var.get()
 
-    try:
-        if text.lower() == 'exit':
-            messagebox.showinfo("Info", CLOSING_MESSAGE)
-            root.quit()
+    if text.lower() == 'exit':
+        messagebox.showinfo("Info", CLOSING_MESSAGE)
+        root.quit()
+        return
+
+    # Check for empty input
+    if not text.strip():
+        messagebox.showerror("Error", "Input text is empty. Please enter some text.")
+        return
 
-        # Check for empty input
-        if not text.strip():
-            messagebox.showerror("Error", "Input text is empty. Please enter some text.")
-            return
+    # Generate in the background so the window stays responsive while the image is built and saved
+    generate_button.configure(state="disabled")
+    threading.Thread(target=generate_image_in_background, args=(text, font, color), daemon=True).start()
 
+# Function to generate the image off the Tk main thread
+def generate_image_in_background(text, font, color):
+    try:
         filename = generate_filename(text)
         font_paths = get_font_paths(font, color)
 
         img_path, error_message_generate = generate_image(text, filename, font_paths)
 
         if error_message_generate:
-            messagebox.showerror("Error", f"Error: {error_message_generate}")
+            post_result(messagebox.showerror, "Error", f"Error: {error_message_generate}")
         else:
-            messagebox.showinfo("Success", f"Image successfully generated and saved as: {img_path}")
+            post_result(messagebox.showinfo, "Success", f"Image successfully generated and saved as: {img_path}")
     except FileNotFoundError as e:
         error_message_generate = f"Font file not found: {e.filename}"
-        messagebox.showerror("Error", error_message_generate)
+        post_result(messagebox.showerror, "Error", error_message_generate)
     except Exception as e:
         error_message_generate = f"An error occurred: {e}"
-        messagebox.showerror("Error", error_message_generate)
+        post_result(messagebox.showerror, "Error", error_message_generate)
+
+# Function to hand a generation result back to the Tk main thread
+def post_result(show_message, title, message):
+    root.after(0, lambda: finish_generation(show_message, title, message))
+
+# Function to re-enable the generate button and show the result
+def finish_generation(show_message, title, message):
+    generate_button.configure(state="normal")
+    show_message(title, message)
 
 # Function to handle font selection change
 def on_font_change(*args):
@@ -1,8 +1,12 @@
+import io
 import os
+import json
 import sys
 import time
+import random
 import shutil
-import requests
+import email.utils
+import importlib.util
 import platform
 import subprocess
 import semantic_version
@@ -19,11 +23,26 @@ RELEASE_FILE_EXTENSION = '.exe'
 CURRENT_VERSION = '0.3.7'
 
 VERIFY_SSL = True
+REQUEST_TIMEOUT = 30
 
 MAX_RETRIES = 3
+RETRY_BASE_DELAY = 5
+RETRY_JITTER = 1
+MAX_RATE_LIMIT_WAIT = 60
+
+MIN_BUFFER_SIZE = 64 * 1024
+DEFAULT_BUFFER_SIZE = 64 * 1024
+MAX_BUFFER_SIZE = 1024 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+PROGRESS_UPDATE_BLOCKS = 8
+
+RELEASE_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "metalslugfont", "etag.json")
 
 ERROR_MESSAGE = "Launch Error"
 
+# Shared HTTP client, reused so repeated requests to a host keep their pooled connection
+http_client = None
+
 customtkinter.set_appearance_mode("dark")
 customtkinter.set_default_color_theme("blue")
 
@@ -32,6 +51,17 @@ class RateLimitExceededError(Exception):
     def __init__(self, sleep_time):
         self.sleep_time = sleep_time
 
+# Function to get the shared HTTP client, importing httpx on first use
+def get_http_client():
+    global http_client
+    if http_client is None:
+        import httpx
+
+        # HTTP/2 needs the optional h2 package, use HTTP/1.1 without it
+        http2 = importlib.util.find_spec('h2') is not None
+        http_client = httpx.Client(http2=http2, verify=VERIFY_SSL, timeout=REQUEST_TIMEOUT, follow_redirects=True)
+    return http_client
+
 # Function to get a random user agent for making HTTP requests
 def get_random_user_agent():
     user_agent = UserAgent()
@@ -39,10 +69,13 @@ def get_random_user_agent():
 
 # Function to check for updates
 def check_for_updates(root):
-    retries = 0
-    while retries < MAX_RETRIES:
+    for attempt in range(MAX_RETRIES):
         try:
-            latest_version_str, download_url = get_latest_version_and_download_url()
+            release = get_latest_version_and_download_url()
+            if release is None:
+                return
+
+            latest_version_str, download_url = release
             current_version = semantic_version.Version(CURRENT_VERSION)
             latest_version = semantic_version.Version(latest_version_str)
 
@@ -51,14 +84,18 @@ def check_for_updates(root):
             else:
                 handle_update_confirmation(download_url, root)
 
-            break
+            return
         except RateLimitExceededError as e:
-            handle_rate_limit_exceeded(e)
+            # No point waiting after the last attempt
+            if attempt == MAX_RETRIES - 1:
+                break
+            if not handle_rate_limit_exceeded(e, attempt):
+                return
         except Exception as e:
             handle_error(f"An unexpected error occurred while processing release data: {e}")
+            return
 
-    if retries == MAX_RETRIES:
-        messagebox.showerror("Update Error", "Maximum retry limit reached. Unable to check for updates.")
+    messagebox.showerror("Update Error", "Maximum retry limit reached. Unable to check for updates.")
 
 def show_up_to_date_message(current_version):
     messagebox.showinfo("Update Check", f"You are currently running version '{current_version}', which is up to date.")
@@ -94,73 +131,183 @@ def handle_update(download_url, root):
     else:
         download_update(download_url, root)
 
-# Function to handle rate limit exceeded
-def handle_rate_limit_exceeded(exception):
-    sleep_time = exception.sleep_time
-    messagebox.showinfo("Rate Limit Exceeded", f"Rate limit exceeded. Sleeping for {sleep_time:.0f} seconds until the rate limit is reset.")
+# Function to handle rate limit exceeded, returns whether the check should be retried
+def handle_rate_limit_exceeded(exception, attempt):
+    # Wait for the reset GitHub reported, or back off exponentially when it gave none
+    sleep_time = exception.sleep_time or RETRY_BASE_DELAY * 2 ** attempt
+
+    if sleep_time > MAX_RATE_LIMIT_WAIT:
+        messagebox.showerror("Rate Limit Exceeded", f"Rate limit exceeded. Please try again in about {sleep_time / 60:.0f} minutes.")
+        return False
+
+    sleep_time += random.uniform(0, RETRY_JITTER)
+    messagebox.showinfo("Rate Limit Exceeded", f"Rate limit exceeded. Retrying in {sleep_time:.0f} seconds.")
     time.sleep(sleep_time)
+    return True
+
+# Function to check if a response was refused because of a GitHub rate limit
+def is_rate_limited(response):
+    if response.status_code == 429:
+        return True
+    # A 403 is only a rate limit when GitHub says so, other 403s are real errors
+    if response.status_code == 403:
+        return response.headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in response.headers
+    return False
+
+# Function to get the seconds to wait from a Retry-After header, given as seconds or an HTTP date
+def parse_retry_after(retry_after, default):
+    if not retry_after:
+        return default
+    try:
+        return max(0, int(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
 
 # Function to check if an update file already exists
 def is_update_file_exist(download_url):
     download_path = os.path.join(os.path.expanduser("~"), "Downloads", os.path.basename(download_url))
     return os.path.exists(download_path)
 
+# Function to load the cached ETag and release info from the last check
+def load_release_cache():
+    try:
+        with open(RELEASE_CACHE_PATH, 'r', encoding='utf-8') as cache_file:
+            cache = json.load(cache_file)
+        if cache.get('etag') and cache.get('tag'):
+            return cache
+    except (OSError, ValueError):
+        pass
+    return None
+
+# Function to save the ETag and release info for the next check
+def save_release_cache(etag, tag, url):
+    try:
+        os.makedirs(os.path.dirname(RELEASE_CACHE_PATH), exist_ok=True)
+        with open(RELEASE_CACHE_PATH, 'w', encoding='utf-8') as cache_file:
+            json.dump({'etag': etag, 'tag': tag, 'url': url}, cache_file)
+    except OSError:
+        # The cache only saves API quota, a failed write is not an error
+        pass
+
 # Function to get the latest version and download URL from GitHub
 def get_latest_version_and_download_url():
     try:
+        import httpx
+
         headers = {
             'User-Agent': get_random_user_agent()
         }
 
-        response = requests.get(f'https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/releases/latest', headers=headers, verify=VERIFY_SSL)
-        response.raise_for_status()
+        # Send the last ETag so an unchanged release comes back as an empty 304
+        release_cache = load_release_cache()
+        if release_cache:
+            headers['If-None-Match'] = release_cache['etag']
+
+        response = get_http_client().get(f'https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/releases/latest', headers=headers)
 
-        remaining_requests = int(response.headers.get('X-RateLimit-Remaining', 0))
-        reset_timestamp = int(response.headers.get('X-RateLimit-Reset', 0))
-        current_time = time.time()
+        if response.status_code == 304 and release_cache:
+            return get_release_result(release_cache['tag'], release_cache['url'])
 
-        if remaining_requests <= 0:
-            sleep_time = max(0, reset_timestamp - current_time)
+        if is_rate_limited(response):
+            reset_timestamp = int(response.headers.get('X-RateLimit-Reset', 0))
+            sleep_time = parse_retry_after(response.headers.get('Retry-After'), max(0, reset_timestamp - time.time()))
             raise RateLimitExceededError(sleep_time)
 
+        response.raise_for_status()
+
         release_data = response.json()
         latest_version_str = release_data['tag_name']
 
-        if latest_version_str != CURRENT_VERSION:
-            download_url = get_download_url(release_data)
-            return latest_version_str, download_url
-        return latest_version_str, None
-    except requests.exceptions.RequestException as e:
+        download_url = get_download_url(release_data)
+
+        # Cache the asset URL whatever this build's version is, the cache outlives the build
+        etag = response.headers.get('ETag')
+        if etag:
+            save_release_cache(etag, latest_version_str, download_url)
+
+        return get_release_result(latest_version_str, download_url)
+    except ImportError as e:
+        handle_error(f"The updater needs the httpx package to check for updates: {e}")
+    except httpx.HTTPError as e:
         handle_error(f"Failed to retrieve release data. Please check your internet connection: {e}")
 
+# Function to pair the latest version with its download URL, only when it differs from this build
+def get_release_result(latest_version_str, download_url):
+    if latest_version_str != CURRENT_VERSION:
+        return latest_version_str, download_url
+    return latest_version_str, None
+
 # Function to get the download URL from the release data
 def get_download_url(release_data):
     for asset in release_data['assets']:
         if asset['name'].endswith(RELEASE_FILE_EXTENSION):
             return asset['browser_download_url']
 
+# Function to pick a read buffer size scaled to the download size
+def get_download_buffer_size(total_size):
+    return max(MIN_BUFFER_SIZE, min(MAX_BUFFER_SIZE, total_size // 100 or DEFAULT_BUFFER_SIZE))
+
+# Function to reserve disk space for a file before writing it
+def preallocate_file(outfile, total_size):
+    fd = outfile.fileno()
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, total_size)
+        else:
+            os.ftruncate(fd, total_size)
+    except OSError:
+        # Preallocation is only an optimization, keep going without it
+        pass
+    outfile.seek(0)
+
 # Function to download the update
 def download_update(download_url, root):
     try:
+        import httpx
+
         download_path = os.path.join(os.path.expanduser("~"), "Downloads", os.path.basename(download_url))
         temp_download_path = download_path + '.temp'
 
-        with requests.get(download_url, stream=True, verify=VERIFY_SSL) as response, open(temp_download_path, 'ab') as outfile:
+        with get_http_client().stream('GET', download_url) as response:
             response.raise_for_status()
             total_size = int(response.headers.get('content-length', 0))
-            block_size = 1024
+            buffer_size = get_download_buffer_size(total_size)
             progress_bar = ttk.Progressbar(root, length=300, mode="determinate")
             progress_bar.grid(column=0, row=3, columnspan=2, pady=10)
             progress_bar["maximum"] = total_size
             progress = 0
+            reported_progress = 0
+            progress_step = buffer_size * PROGRESS_UPDATE_BLOCKS
+
+            with io.BufferedWriter(open(temp_download_path, 'wb', buffering=0), WRITE_BUFFER_SIZE) as outfile:
+                if total_size > 0:
+                    preallocate_file(outfile, total_size)
+
+                for data in response.iter_bytes(chunk_size=buffer_size):
+                    outfile.write(data)
+                    progress += len(data)
+
+                    # Redraw the progress bar every few blocks rather than after each one
+                    if progress - reported_progress >= progress_step:
+                        reported_progress = progress
+                        progress_bar["value"] = progress
+                        root.update_idletasks()
 
-            for data in response.iter_content(block_size):
-                progress += len(data)
                 progress_bar["value"] = progress
                 root.update_idletasks()
-                outfile.write(data)
 
-        shutil.move(temp_download_path, download_path)
+                # Drop any preallocated space that was not written
+                outfile.truncate()
+
+                # Make sure the whole file is on disk before it replaces the old one
+                outfile.flush()
+                os.fsync(outfile.fileno())
+
+        os.replace(temp_download_path, download_path)
 
         # Wait 3 seconds before starting the executable
         time.sleep(3)
@@ -168,7 +315,9 @@ def download_update(download_url, root):
         # Launch the downloaded file
         launch_downloaded_file(download_path)
 
-    except requests.exceptions.RequestException as e:
+    except ImportError as e:
+        handle_error(f"The updater needs the httpx package to download the update: {e}")
+    except httpx.HTTPError as e:
         handle_error(f"Failed to download the update. Please check your internet connection: {e}")
 
 # Function to check if Wine is installed